@@ -1,19 +1,27 @@
 import os
-import sqlite3
 import threading
 import time
 import base64
 import re
-# 【修改1】引入 timezone 模块以支持新版时间标准
-from datetime import datetime, timedelta, timezone
+import json
+import gzip
+import hashlib
+from collections import OrderedDict
+from datetime import timedelta
 from functools import wraps, lru_cache
-from urllib.parse import quote, unquote, urlparse
-import requests
-from requests.adapters import HTTPAdapter
-from flask import Flask, flash, render_template, request, Response, redirect, session, url_for
+from urllib.parse import unquote, urlparse
+from flask import Flask, flash, render_template, request, Response, redirect, session, url_for, stream_with_context
 from bs4 import BeautifulSoup
+import core
+from core import (SITES_CONFIG, BANK_KEYWORDS, HEADERS, CircuitOpenError, RateLimitedError,
+                  get_beijing_now, get_db_connection, clean_html, fetch, host_health,
+                  article_hub, article_summary, publish_article, scrape_all_sites)
 from apscheduler.schedulers.background import BackgroundScheduler
 from waitress import serve
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，缺失时只用 gzip
+    brotli = None
 
 # ==========================================
 # 1. 基础配置
@@ -27,72 +35,29 @@ ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', '123')
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024 
 CRON_SECRET = os.environ.get('CRON_SECRET', 'xianbao_secret_key_999')
 
-# 站点配置
-SITES_CONFIG = {
-    "xianbao": { 
-        "name": "线报库", 
-        "domain": "https://new.xianbao.fun", 
-        "list_url": "https://new.xianbao.fun/", 
-        "list_selector": "#mainbox > div.listbox tr, #mainbox > div.listbox li", 
-        "content_selector": "#mainbox article .article-content, #art-fujia, #mainbox > article > div.art-content > div.art-copyright.br > div:nth-child(1)"
-    },
-    "iehou": { 
-        "name": "爱猴线报", 
-        "domain": "https://iehou.com", 
-        "list_url": "https://iehou.com/", 
-        "list_selector": "#body ul li",
-        "content_selector": ".thread-content"
-    },
-    "xianbao_icu": {
-        "name": "鲸线报",  
-        "domain": "https://xianbao.icu",
-        "list_url": "https://xianbao.icu/xianbao",  
-        "list_selector": "main div div div:nth-child(3) > div:nth-child(2) a, main a[href*='/xianbao/detail'], main a[href*='/detail'], ul li a[href*='/detail']",
-        "content_selector": "main > div:nth-of-type(2) > div > div, .prose, .prose-max, .content, .entry-content, .post-body, .detail-body, .markdown, .article-detail, .text"
-   }
-}
-
-# 银行关键词
-BANK_KEYWORDS = {
-    "农行": ["农行", "农业银行", "农", "nh"],
-    "工行": ["工行", "工商银行", "工", "gh"],
-    "建行": ["建行", "建设银行", "建", "CCB", "jh"],
-    "中行": ["中行", "中国银行", "中hang"]
-}
-ALL_BANK_VALS = [word for words in BANK_KEYWORDS.values() for word in words]
-
-# 数据库路径
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-os.makedirs(DATA_DIR, exist_ok=True)
-DB_PATH = os.path.join(DATA_DIR, "xianbao.db")
-
 PER_PAGE = 30
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-    "Referer": "https://www.google.com/"
-}
-
-# 网络请求 Session
-session_req = requests.Session()
-session_req.headers.update(HEADERS)
-adapter = HTTPAdapter(pool_connections=50, pool_maxsize=50, max_retries=1)
-session_req.mount('http://', adapter)
-session_req.mount('https://', adapter)
-
-scrape_lock = threading.Lock()
-
-# 【修改2】符合 Python 3.12+ 标准的北京时间获取函数
-def get_beijing_now():
-    # 1. 获取带时区信息的 UTC 时间 (datetime.now(timezone.utc))
-    # 2. 转换为北京时区 (.astimezone(...))
-    # 3. 移除时区信息 (.replace(tzinfo=None)) -> 变成“无时区”对象
-    # 为什么要移除时区？因为你的数据库和后续的减法逻辑使用的是简单的数字计算，
-    # 如果保留时区，Python 会报错 "can't subtract offset-naive and offset-aware datetimes"
-    return datetime.now(timezone.utc).astimezone(timezone(timedelta(hours=8))).replace(tzinfo=None)
-
-# 初始化活跃时间
-LAST_ACTIVE_TIME = get_beijing_now()
+
+# 实时推送 (SSE) 配置
+STREAM_HEARTBEAT = 15      # 心跳间隔(秒)，防止代理断开空闲连接
+STREAM_MAX_AGE = 600       # 单个连接最长保持(秒)，到期让浏览器自动重连，释放 waitress 线程
+STREAM_MAX_SUBSCRIBERS = 16   # 同时在线的推送连接上限，必须远小于 waitress threads=80
+STREAM_RETRY_FULL = 60000     # 连接已满时让浏览器多久后再试(毫秒)
+STREAM_BATCH_SIZE = 200       # 每次查库最多推送的文章数（断线续传补齐时分批发送）
+stream_slots = threading.BoundedSemaphore(STREAM_MAX_SUBSCRIBERS)
+
+# JSON API 配置
+API_MAX_LIMIT = 100
+API_FIELDS = ('id', 'title', 'url', 'site_source', 'match_keyword', 'original_time', 'is_top', 'updated_at')
+API_DEFAULT_FIELDS = ('id', 'title', 'match_keyword', 'original_time', 'is_top')
+
+# 响应压缩配置
+COMPRESS_MIN_SIZE = 1024                  # 小于该字节数不压缩
+COMPRESS_CACHE_BYTES = 32 * 1024 * 1024   # 压缩结果缓存上限
+COMPRESS_MIMETYPES = {'text/html', 'text/plain', 'text/css', 'text/javascript', 'application/javascript',
+                      'application/json', 'image/svg+xml'}
+compress_cache = OrderedDict()   # (etag, encoding) -> 压缩后的 bytes，LRU
+compress_cache_size = 0
+compress_lock = threading.Lock()
 
 # ==========================================
 # 2. 数据库与工具函数
@@ -106,115 +71,13 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH, timeout=60)
-    conn.row_factory = sqlite3.Row
-    conn.execute('PRAGMA journal_mode=WAL;')
-    
-    conn.execute('''CREATE TABLE IF NOT EXISTS articles(
-        id INTEGER PRIMARY KEY AUTOINCREMENT, 
-        title TEXT, url TEXT UNIQUE, site_source TEXT,
-        match_keyword TEXT, original_time TEXT, is_top INTEGER DEFAULT 0,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    
-    conn.execute('''CREATE TABLE IF NOT EXISTS config_rules(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        rule_type TEXT, keyword TEXT, match_scope TEXT DEFAULT 'title',
-        UNIQUE(keyword, match_scope))''')
-    
-    conn.execute('CREATE TABLE IF NOT EXISTS article_content(url TEXT PRIMARY KEY, content TEXT, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
-    conn.execute('CREATE TABLE IF NOT EXISTS scrape_log(id INTEGER PRIMARY KEY AUTOINCREMENT, last_scrape TEXT)')
-    conn.execute('CREATE TABLE IF NOT EXISTS visit_stats(ip TEXT PRIMARY KEY, visit_count INTEGER DEFAULT 1, last_visit TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
-    
-    conn.commit()
-    return conn
-
-def make_links_clickable(text):
-    # 匹配 http/https URL，但排除已经在 href= 里的情况
-    pattern = re.compile(r'(?<!href=")(https?://[^\s"<]+)', re.IGNORECASE)
-    return pattern.sub(r'<a href="\1" target="_blank" rel="noopener noreferrer" class="content-link">\1</a>', text)
-
-def clean_html(html_content, site_key):
-    if not html_content:
-        return ""
-
-    soup = BeautifulSoup(html_content, "html.parser")
-
-    for tag in soup.find_all(True):
-
-        # ============================
-        # 1) 图片处理逻辑
-        # ============================
-        if tag.name == 'img':
-            src = tag.get('src', '').strip()
-            if not src:
-                continue
-
-            # ---- 避免重复包装 /img_proxy ----
-            if src.startswith("/img_proxy"):
-                continue
-
-            # ---- 补全各种相对路径 ----
-            if src.startswith('//'):  # //img.xx.com/xx.jpg
-                src = 'https:' + src
-
-            elif src.startswith('/'):  # /upload/xxx.jpg
-                src = SITES_CONFIG[site_key]['domain'] + src
-
-            elif src.startswith('./'):  # ./images/xxx.jpg
-                src = SITES_CONFIG[site_key]['domain'] + src[1:]
-
-            elif src.startswith('../'):  # ../xx/xx.jpg
-                src = SITES_CONFIG[site_key]['domain'] + src.replace('../', '', 1)
-
-            # ---- 这里不做更多处理，否则容易误判 HTML 图片 ----
-
-            # ---- URL 转义 + 走 img_proxy ----
-            proxy_url = "/img_proxy?url=" + quote(src, safe='/:?=&')
-
-            tag.attrs = {
-                'src': proxy_url,
-                'loading': 'lazy',
-                'style': 'max-width:100%; height:auto; border-radius:8px; margin:10px 0;'
-            }
-
-        # ============================
-        # 2) 链接处理逻辑
-        # ============================
-        elif tag.name == 'a':
-            href = tag.get('href', '').strip()
-            if not href:
-                continue
-
-            # ---- 避免自引用 /img_proxy ----
-            if href.startswith('/img_proxy'):
-                continue
-
-            # ---- 补全相对路径 ----
-            if href.startswith('//'):
-                href = 'https:' + href
-            elif href.startswith('/'):
-                href = SITES_CONFIG[site_key]['domain'] + href
-
-            # ---- 保留为正常蓝色链接 ----
-            tag.attrs = {
-                'href': href,
-                'target': '_blank',
-                'rel': 'noopener noreferrer',
-                'style': 'color:#007aff; text-decoration:underline; word-break:break-all;'
-            }
-
-    return str(soup)
-
-
-
 def record_visit():
     ua = request.headers.get('User-Agent', '')
     if 'HealthCheck' in ua or 'Zeabur' in ua: return
     ip = request.headers.get('X-Forwarded-For', request.remote_addr)
     
-    global LAST_ACTIVE_TIME
-    LAST_ACTIVE_TIME = get_beijing_now()
+    # 抓取的无人访问休眠判断读取 core 中的活跃时间
+    core.LAST_ACTIVE_TIME = get_beijing_now()
     
     try:
         conn = get_db_connection()
@@ -223,6 +86,50 @@ def record_visit():
         conn.commit(); conn.close()
     except: pass
 
+def choose_encoding(accept_encoding):
+    """根据 Accept-Encoding 选择压缩方式，优先 br，其次 gzip；都不接受返回 None。"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try: q = float(params.strip()[2:])
+            except ValueError: q = 0.0
+        if name: accepted[name.strip().lower()] = q
+    star = accepted.get('*', 0)
+    if brotli and accepted.get('br', star) > 0:
+        return 'br'
+    if accepted.get('gzip', star) > 0:
+        return 'gzip'
+    return None
+
+def compress_payload(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+def get_compressed(etag, encoding, data):
+    """按 ETag 缓存压缩结果，热门页面不用每次都重新压缩。etag 为空时不缓存。"""
+    global compress_cache_size
+    if etag:
+        with compress_lock:
+            cached = compress_cache.get((etag, encoding))
+            if cached is not None:
+                compress_cache.move_to_end((etag, encoding))
+                return cached
+
+    compressed = compress_payload(data, encoding)
+
+    if etag and len(compressed) <= COMPRESS_CACHE_BYTES // 8:
+        with compress_lock:
+            if (etag, encoding) not in compress_cache:
+                compress_cache[(etag, encoding)] = compressed
+                compress_cache_size += len(compressed)
+            while compress_cache_size > COMPRESS_CACHE_BYTES:
+                _, old = compress_cache.popitem(last=False)
+                compress_cache_size -= len(old)
+    return compressed
+
 def upload_to_img_cdn(img_data):
     return f"data:image/png;base64,{base64.b64encode(img_data).decode()}"
 
@@ -230,6 +137,45 @@ def upload_to_img_cdn(img_data):
 # 3. 核心路由
 # ==========================================
 
+@app.after_request
+def compress_response(resp):
+    """
+    gzip/br 压缩文本类响应，并处理 ETag / If-None-Match。
+    压缩变体的 ETag 带 -gzip / -br 后缀，客户端带回任一变体都返回 304。
+    """
+    if request.method not in ('GET', 'HEAD') or resp.status_code != 200:
+        return resp
+    if resp.direct_passthrough or resp.is_streamed or resp.mimetype not in COMPRESS_MIMETYPES:
+        return resp
+    if 'Content-Encoding' in resp.headers:
+        return resp
+
+    resp.vary.add('Accept-Encoding')
+    data = resp.get_data()
+    encoding = choose_encoding(request.headers.get('Accept-Encoding')) if len(data) >= COMPRESS_MIN_SIZE else None
+
+    etag, weak = resp.get_etag()
+    if not etag and not resp.cache_control.no_store:
+        resp.add_etag()
+        etag, weak = resp.get_etag()
+    if weak:
+        etag = None
+    variant_etag = f"{etag}-{encoding}" if etag and encoding else etag
+
+    if etag and any(request.if_none_match.contains(t) for t in (etag, f"{etag}-gzip", f"{etag}-br")):
+        resp.status_code = 304
+        resp.set_data(b'')
+        resp.headers.pop('Content-Length', None)
+        resp.headers.pop('Content-Type', None)
+        resp.set_etag(variant_etag)
+        return resp
+
+    if encoding:
+        resp.set_data(get_compressed(etag, encoding, data))
+        resp.headers['Content-Encoding'] = encoding
+        resp.set_etag(variant_etag)
+    return resp
+
 @app.route('/')
 def index():
     record_visit()
@@ -272,6 +218,71 @@ def index():
                            current_page=page, 
                            total_pages=(total+PER_PAGE-1)//PER_PAGE)
 
+@app.route('/api/articles')
+def api_articles():
+    """
+    文章列表 JSON 接口，给轻量客户端/CDN 使用。
+    ?tag= &q=       与首页相同的过滤
+    ?fields=id,title 只返回需要的列
+    ?cursor=        上一页返回的 next_cursor（按 is_top, id 的 keyset 翻页）
+    ?since_id=      增量同步：只返回 id 更大的文章（按 id 升序）
+    ?limit=         每页条数，最大 API_MAX_LIMIT
+    """
+    record_visit()
+    tag = request.args.get('tag')
+    q = request.args.get('q')
+    limit = max(1, min(request.args.get('limit', PER_PAGE, type=int), API_MAX_LIMIT))
+    since_id = request.args.get('since_id', type=int)
+    cursor = request.args.get('cursor', '')
+
+    fields = [f for f in request.args.get('fields', '').split(',') if f in API_FIELDS] or list(API_DEFAULT_FIELDS)
+    cols = list(fields) if 'id' in fields else ['id'] + fields
+    if since_id is None and 'is_top' not in cols:
+        cols.append('is_top')  # keyset 游标需要
+
+    where = "WHERE 1=1"
+    params = []
+    if tag:
+        where += " AND match_keyword = ?"
+        params.append(tag)
+    if q:
+        where += " AND title LIKE ?"
+        params.append(f"%{q}%")
+
+    if since_id is not None:
+        where += " AND id > ?"
+        params.append(since_id)
+        order = "id ASC"
+    else:
+        order = "is_top DESC, id DESC"
+        if cursor:
+            try:
+                c_top, c_id = (int(x) for x in base64.urlsafe_b64decode(cursor.encode()).decode().split(':'))
+            except (ValueError, UnicodeDecodeError):
+                return {"error": "invalid cursor"}, 400
+            where += " AND (is_top < ? OR (is_top = ? AND id < ?))"
+            params += [c_top, c_top, c_id]
+
+    conn = get_db_connection()
+    rows = conn.execute(f"SELECT {', '.join(cols)} FROM articles {where} ORDER BY {order} LIMIT ?",
+                        params + [limit + 1]).fetchall()
+    conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    payload = {'items': [{f: r[f] for f in fields} for r in rows], 'has_more': has_more}
+    if since_id is not None:
+        payload['next_since_id'] = rows[-1]['id'] if rows else since_id
+    elif has_more:
+        last = rows[-1]
+        payload['next_cursor'] = base64.urlsafe_b64encode(f"{last['is_top']}:{last['id']}".encode()).decode()
+
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    resp = Response(body, mimetype='application/json', headers={'Cache-Control': 'public, max-age=30'})
+    # 强 ETag；压缩与 304 由 compress_response 统一处理
+    resp.set_etag(hashlib.sha1(body).hexdigest())
+    return resp
+
 @app.route("/view")
 def view():
     article_id = request.args.get("id", type=int)
@@ -287,7 +298,8 @@ def view():
         content = cached["content"] if site_key == "user" else clean_html(cached["content"], site_key)
     elif site_key in SITES_CONFIG:
         try:
-            r = session_req.get(url, timeout=10)
+            # 用户在等页面，不重试，最坏占用线程时间不超过一次超时
+            r = fetch(url, purpose='view', retries=0)
             r.encoding = 'utf-8'
             soup = BeautifulSoup(r.text, "html.parser")
             
@@ -341,6 +353,12 @@ def view():
                 else:
                     content = "暂无内容"
                     
+        except CircuitOpenError as e:
+            print(f"Skip fetching content: {e}")
+            content = "源站暂时不可用，请稍后再试或点击右上角原文链接。"
+        except RateLimitedError as e:
+            print(f"Skip fetching content: {e}")
+            content = "当前访问人数较多，请稍后刷新或点击右上角原文链接。"
         except Exception as e:
             print(f"Error fetching content: {e}")
             content = "加载原文失败，请尝试点击右上角原文链接。"
@@ -399,10 +417,11 @@ def publish():
         fake_url = f"user://{int(time.time())}"
         
         conn = get_db_connection()
-        conn.execute("INSERT INTO articles (title, url, site_source, match_keyword, original_time, is_top) VALUES (?,?,?,?,?,?)",
-                     (title, fake_url, "user", "羊毛精选", "刚刚", is_top))
+        cur = conn.execute("INSERT INTO articles (title, url, site_source, match_keyword, original_time, is_top) VALUES (?,?,?,?,?,?)",
+                           (title, fake_url, "user", "羊毛精选", "刚刚", is_top))
         conn.execute("INSERT INTO article_content (url, content) VALUES (?,?)", (fake_url, processed))
         conn.commit()
+        publish_article(cur.lastrowid)
         conn.close()
         return redirect('/')
     return render_template('publish.html')
@@ -484,7 +503,7 @@ def show_logs():
     logs = conn.execute('SELECT last_scrape FROM scrape_log ORDER BY id DESC LIMIT 50').fetchall()
     visitors = conn.execute('SELECT * FROM visit_stats ORDER BY last_visit DESC LIMIT 30').fetchall()
     conn.close()
-    return render_template('logs.html', logs=logs, visitors=visitors)
+    return render_template('logs.html', logs=logs, visitors=visitors, hosts=host_health())
 
 @lru_cache(maxsize=200)
 def fetch_image_cached(url):
@@ -492,7 +511,7 @@ def fetch_image_cached(url):
     从远程源下载图片并缓存，避免重复下载。
     返回 (bytes, content-type)
     """
-    r = session_req.get(url, headers={"User-Agent": HEADERS["User-Agent"], "Referer": ""}, timeout=15)
+    r = fetch(url, purpose='image', retries=0, headers={"User-Agent": HEADERS["User-Agent"], "Referer": ""})
     return r.content, r.headers.get("Content-Type", "image/jpeg")
 
 
@@ -529,7 +548,8 @@ def img_proxy():
             "sec-fetch-site": "cross-site"
         }
 
-        r = session_req.get(url, headers=headers, timeout=15, stream=True, allow_redirects=True)
+        # 图片失败直接返回占位图，不重试，避免占住请求线程
+        r = fetch(url, purpose='image', retries=0, max_wait=0.5, headers=headers, stream=True, allow_redirects=True)
         
         if r.status_code != 200:
             print(f"[IMG_PROXY] {url} 返回 {r.status_code}")
@@ -544,6 +564,72 @@ def img_proxy():
         return Response(transparent_png, content_type="image/png")
 
 
+@app.route('/stream')
+def stream():
+    """
+    SSE 实时推送新文章摘要。
+    ?tag=农行&tag=建行 或 ?tag=农行,建行 只接收指定分类；
+    断线重连时浏览器会带上 Last-Event-ID，从该 id 之后补发。
+    """
+    tags = set()
+    for t in request.args.getlist('tag'):
+        for x in t.split(','):
+            x = x.strip()
+            if not x: continue
+            # 允许用别名订阅，如 nh / 农业银行 -> 农行
+            tags.add(next((b_name for b_name, b_v in BANK_KEYWORDS.items() if x in b_v), x))
+
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('since_id', type=int)
+
+    # 每个连接占一个 waitress 线程，满了直接 503，不排队
+    if not stream_slots.acquire(blocking=False):
+        return Response(f"retry: {STREAM_RETRY_FULL}\n\n", status=503, mimetype='text/event-stream',
+                        headers={'Retry-After': str(STREAM_RETRY_FULL // 1000), 'Cache-Control': 'no-cache'})
+
+    def fmt(article):
+        return f"id: {article['id']}\nevent: article\ndata: {json.dumps(article, ensure_ascii=False)}\n\n"
+
+    def load_since(last_id):
+        """以数据库为准取 id > last_id 的文章，其它 worker 或 scraper.py 写入的也能取到。"""
+        conn = get_db_connection()
+        try:
+            where, params = "WHERE id > ?", [last_id]
+            if tags:
+                where += f" AND match_keyword IN ({','.join('?' * len(tags))})"
+                params += list(tags)
+            return conn.execute(f"SELECT id, title, site_source, match_keyword, original_time, is_top FROM articles {where} ORDER BY id LIMIT ?",
+                                params + [STREAM_BATCH_SIZE]).fetchall()
+        finally:
+            conn.close()
+
+    def generate(last_id):
+        if last_id is None:
+            conn = get_db_connection()
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM articles").fetchone()[0]
+            conn.close()
+
+        yield "retry: 5000\n\n"
+        deadline = time.time() + STREAM_MAX_AGE
+        while time.time() < deadline:
+            # 断线续传时先补齐错过的文章；之后本进程 publish 会提前唤醒，否则每个心跳周期查一次库。
+            # 先读通知 id 再查库：查库期间到达的 publish 会让下面的 wait 立即返回，不会丢唤醒
+            seen = article_hub.latest_id()
+            rows = load_since(last_id)
+            if not rows:
+                yield ": ping\n\n"
+            for row in rows:
+                last_id = row['id']
+                yield fmt(article_summary(row))
+            # 被过滤掉的文章也计入 seen，避免它们反复唤醒导致空转
+            article_hub.wait(max(last_id, seen), STREAM_HEARTBEAT)
+
+    resp = Response(stream_with_context(generate(last_id)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    resp.call_on_close(stream_slots.release)
+    return resp
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST' and request.form.get('password') == ADMIN_PASSWORD:
@@ -586,148 +672,9 @@ def cron_scrape():
         return {"status": "error", "message": str(e)}, 500
 
 # ==========================================
-# 4. 抓取与启动
+# 4. 启动
 # ==========================================
 
-def scrape_all_sites():
-    global LAST_ACTIVE_TIME
-    if scrape_lock.locked():
-        print("抓取锁被占用，跳过本次执行")
-        return
-    
-    with scrape_lock:
-        try:
-            now_beijing = get_beijing_now()
-            
-            # 无人访问休眠逻辑
-            if (now_beijing - LAST_ACTIVE_TIME).total_seconds() > 3600:
-                if now_beijing.minute % 60 == 0:
-                    print(f"[{now_beijing.strftime('%H:%M')}] 系统处于无人访问休眠状态...")
-                return
-
-            # 夜间低频模式
-            if 1 <= now_beijing.hour <= 5:
-                if now_beijing.minute % 30 != 0:
-                    return
-
-            conn = get_db_connection()
-            rules = conn.execute("SELECT * FROM config_rules").fetchall()
-            title_white = [r['keyword'] for r in rules if r['rule_type']=='white' and r['match_scope']=='title']
-            title_black = [r['keyword'] for r in rules if r['rule_type']=='black' and r['match_scope']=='title']
-            url_black   = [r['keyword'] for r in rules if r['rule_type']=='black' and r['match_scope']=='url']
-            
-            base_keywords = ALL_BANK_VALS + title_white
-            stats = {}
-            
-            # 用于本次抓取去重的集合（标题标准化后）
-            seen_titles_this_run = set()
-
-            for skey, cfg in SITES_CONFIG.items():
-                try:
-                    print(f"\n=== 开始抓取 {cfg['name']} ({skey}) ===")
-                    r = session_req.get(cfg['list_url'], timeout=15)
-                    print(f"  状态码: {r.status_code}")
-                    
-                    soup = BeautifulSoup(r.text, "html.parser")
-                    items = soup.select(cfg['list_selector'])
-                    print(f"  找到 {len(items)} 个匹配项")
-                    
-                    count = 0
-                    for idx, item in enumerate(items, 1):
-                        # --- 修改后的 a 标签提取逻辑 ---
-                        if item.name == 'a':
-                            # 如果 item 本身就是 <a> 标签（常见于鲸线报等站点），直接使用它
-                            # print(f"  [{skey} {idx:02d}] Item 本身就是 <a> 标签，使用它。")
-                            a = item
-                        else:
-                            # 否则，在 item 内部查找合适的 <a>（兼容其他站点）
-                            # print(f"  [{skey} {idx:02d}] Item 不是 <a>，在内部查找 <a>。")
-                            a = item.select_one("a[href*='view'], a[href*='thread'], a[href*='post'], a[href*='/detail'], a[href*='/xianbao/detail']") or item.find("a")
-                        
-                        if not a:
-                            # print(f"  [{skey} {idx:02d}] ERROR: 未能找到 <a> 标签，跳过")
-                            continue
-                        
-                        # 标题和 URL 必须从 a 取
-                        t = a.get_text(strip=True).strip()
-                        if not t or len(t) < 5:
-                            # print(f"  [{skey} {idx:02d}] 标题太短或为空，跳过")
-                            continue
-                        
-                        h = a.get("href", "")
-                        url = h if h.startswith("http") else (cfg['domain'] + (h if h.startswith("/") else "/" + h))
-                        lower_t = t.lower()
-                        lower_url = url.lower()
-                        
-                        # --- 标题规范化 + 本次运行去重 ---
-                        normalized_title = re.sub(r'\s+', ' ', t.strip().lower())
-                        normalized_title = re.sub(r'[，。！？、；：“”‘’（）【】]', '', normalized_title)
-                        
-                        if normalized_title in seen_titles_this_run:
-                            # print(f"  [{skey} {idx:02d}] 标题已在本次运行中出现过，跳过: {t[:50]}...")
-                            continue
-                        
-                        seen_titles_this_run.add(normalized_title)
-                        # -----------------------------------------------
-                        
-                        # jd/tb 过滤
-                        if 'jd.com' in lower_url or 'tb.cn' in lower_url or 'jd.com' in lower_t or 'tb.cn' in lower_t:
-                            # print(f"  [{skey} {idx:02d}] jd/tb 过滤跳过")
-                            continue
-                        
-                        # 黑名单过滤
-                        black_hit = any(b in url for b in url_black) or any(b in t for b in title_black)
-                        if black_hit:
-                            # print(f"  [{skey} {idx:02d}] 被黑名单过滤跳过")
-                            continue
-                        
-                        # 关键词匹配
-                        kw = next((k for k in base_keywords if k.lower() in lower_t), None)
-                        if kw:
-                            # print(f"  [{skey} {idx:02d}] 匹配关键词: {kw}")
-                            tag = kw
-                            for b_name, b_v in BANK_KEYWORDS.items():
-                                if kw in b_v:
-                                    tag = b_name
-                                    break
-                            
-                            # print(f"      → 尝试插入 (tag={tag}) URL: {url}")
-                            conn.execute('INSERT OR IGNORE INTO articles (title, url, site_source, match_keyword, original_time) VALUES(?,?,?,?,?)',
-                                        (t, url, skey, tag, now_beijing.strftime("%H:%M")))
-                            changes = conn.total_changes
-                            # print(f"      → 插入结果 changes={changes}")
-                            
-                            if changes > 0:
-                                count += 1
-                                # print("      → 成功插入！count +1")
-                            # else:
-                            #     print("      → 未插入（可能是重复URL）")
-                        # else:
-                        #     print(f"  [{skey} {idx:02d}] 无关键词匹配，跳过")
-                        
-                        # print("─" * 80)  # 分隔线，便于阅读
-                    
-                    stats[cfg['name']] = count
-                
-                except Exception as e:
-                    print(f"抓取 {skey} 失败: {e}")
-                    stats[cfg['name']] = "Error"
-                
-                print(f"  {cfg['name']} 本次新增: {count} 条\n")
-            
-            # --- 清理旧数据 ---
-            conn.execute("DELETE FROM articles WHERE site_source != 'user' AND updated_at < datetime('now', '-4 days')")
-            
-            # --- 记录日志 ---
-            conn.execute('INSERT INTO scrape_log(last_scrape) VALUES(?)', 
-                         (f"[{now_beijing.strftime('%m-%d %H:%M')}] {stats}",))
-            
-            conn.commit()
-            conn.close()
-            
-        except Exception as e:
-            print(f"Scrape Loop Error: {e}")
-
 if __name__ == '__main__':
     get_db_connection().close()
     print("Serving on port 8080...")
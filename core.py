@@ -0,0 +1,566 @@
+"""
+抓取核心：配置、数据库、出站请求、解析与关键词匹配。
+不依赖 Flask，scraper.py 定时任务直接导入本模块即可抓取；app.py 的 Web 服务也复用这里的实现。
+"""
+import os
+import sqlite3
+import threading
+import time
+import re
+import random
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote, urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+
+# ==========================================
+# 1. 基础配置
+# ==========================================
+
+# 站点配置
+SITES_CONFIG = {
+    "xianbao": { 
+        "name": "线报库", 
+        "domain": "https://new.xianbao.fun", 
+        "list_url": "https://new.xianbao.fun/", 
+        "list_selector": "#mainbox > div.listbox tr, #mainbox > div.listbox li", 
+        "content_selector": "#mainbox article .article-content, #art-fujia, #mainbox > article > div.art-content > div.art-copyright.br > div:nth-child(1)"
+    },
+    "iehou": { 
+        "name": "爱猴线报", 
+        "domain": "https://iehou.com", 
+        "list_url": "https://iehou.com/", 
+        "list_selector": "#body ul li",
+        "content_selector": ".thread-content"
+    },
+    "xianbao_icu": {
+        "name": "鲸线报",  
+        "domain": "https://xianbao.icu",
+        "list_url": "https://xianbao.icu/xianbao",  
+        "list_selector": "main div div div:nth-child(3) > div:nth-child(2) a, main a[href*='/xianbao/detail'], main a[href*='/detail'], ul li a[href*='/detail']",
+        "content_selector": "main > div:nth-of-type(2) > div > div, .prose, .prose-max, .content, .entry-content, .post-body, .detail-body, .markdown, .article-detail, .text"
+   }
+}
+
+# 银行关键词
+BANK_KEYWORDS = {
+    "农行": ["农行", "农业银行", "农", "nh"],
+    "工行": ["工行", "工商银行", "工", "gh"],
+    "建行": ["建行", "建设银行", "建", "CCB", "jh"],
+    "中行": ["中行", "中国银行", "中hang"]
+}
+ALL_BANK_VALS = [word for words in BANK_KEYWORDS.values() for word in words]
+
+# 数据库路径
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+DB_PATH = os.path.join(DATA_DIR, "xianbao.db")
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "Referer": "https://www.google.com/"
+}
+
+# 网络请求 Session
+session_req = requests.Session()
+session_req.headers.update(HEADERS)
+# 重试交给 fetch() 统一处理（带抖动和全局预算），这里不再自动重试
+adapter = HTTPAdapter(pool_connections=50, pool_maxsize=50, max_retries=0)
+session_req.mount('http://', adapter)
+session_req.mount('https://', adapter)
+
+scrape_lock = threading.Lock()
+
+# 出站请求保护配置（按源站 host 计算）
+FETCH_TIMEOUT = (3.05, 10)    # (连接, 读取) 超时
+# 令牌桶按用途分开计算：(每秒补充的请求数, 桶容量)。抓取对源站要客气；
+# /view 和 /img_proxy 是用户请求，限额要足够高，只防止突发流量打垮源站
+FETCH_LIMITS = {
+    'crawl': (2.0, 5),
+    'view': (20.0, 40),
+    'image': (100.0, 200),
+}
+BREAKER_FAILURES = 5          # 连续失败多少次后熔断
+BREAKER_COOLDOWN = 60         # 熔断后多久放一个探测请求(秒)
+RETRY_BUDGET_RATIO = 0.1      # 每个请求为重试预算存入的额度，即重试最多占请求量的 10%
+RETRY_BUDGET_MAX = 10         # 重试预算上限
+RETRY_BACKOFF = 0.5           # 重试退避基数(秒)，实际等待为 [0, base * 2^n] 的随机值
+HOST_GUARDS_MAX = 200         # 非抓取站点（图片等）最多保留的 host 数，超出按 LRU 淘汰
+HOST_HEALTH_ROWS = 30         # /logs 最多展示的 host 行数
+
+# 【修改2】符合 Python 3.12+ 标准的北京时间获取函数
+def get_beijing_now():
+    # 1. 获取带时区信息的 UTC 时间 (datetime.now(timezone.utc))
+    # 2. 转换为北京时区 (.astimezone(...))
+    # 3. 移除时区信息 (.replace(tzinfo=None)) -> 变成“无时区”对象
+    # 为什么要移除时区？因为你的数据库和后续的减法逻辑使用的是简单的数字计算，
+    # 如果保留时区，Python 会报错 "can't subtract offset-naive and offset-aware datetimes"
+    return datetime.now(timezone.utc).astimezone(timezone(timedelta(hours=8))).replace(tzinfo=None)
+
+# 初始化活跃时间
+LAST_ACTIVE_TIME = get_beijing_now()
+
+# ==========================================
+# 2. 数据库与解析
+# ==========================================
+
+def get_db_connection():
+    conn = sqlite3.connect(DB_PATH, timeout=60)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL;')
+    
+    conn.execute('''CREATE TABLE IF NOT EXISTS articles(
+        id INTEGER PRIMARY KEY AUTOINCREMENT, 
+        title TEXT, url TEXT UNIQUE, site_source TEXT,
+        match_keyword TEXT, original_time TEXT, is_top INTEGER DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    
+    conn.execute('''CREATE TABLE IF NOT EXISTS config_rules(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        rule_type TEXT, keyword TEXT, match_scope TEXT DEFAULT 'title',
+        UNIQUE(keyword, match_scope))''')
+    
+    conn.execute('CREATE TABLE IF NOT EXISTS article_content(url TEXT PRIMARY KEY, content TEXT, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+    conn.execute('CREATE TABLE IF NOT EXISTS scrape_log(id INTEGER PRIMARY KEY AUTOINCREMENT, last_scrape TEXT)')
+    conn.execute('CREATE TABLE IF NOT EXISTS visit_stats(ip TEXT PRIMARY KEY, visit_count INTEGER DEFAULT 1, last_visit TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+    
+    conn.commit()
+    return conn
+
+def make_links_clickable(text):
+    # 匹配 http/https URL，但排除已经在 href= 里的情况
+    pattern = re.compile(r'(?<!href=")(https?://[^\s"<]+)', re.IGNORECASE)
+    return pattern.sub(r'<a href="\1" target="_blank" rel="noopener noreferrer" class="content-link">\1</a>', text)
+
+def clean_html(html_content, site_key):
+    if not html_content:
+        return ""
+
+    soup = BeautifulSoup(html_content, "html.parser")
+
+    for tag in soup.find_all(True):
+
+        # ============================
+        # 1) 图片处理逻辑
+        # ============================
+        if tag.name == 'img':
+            src = tag.get('src', '').strip()
+            if not src:
+                continue
+
+            # ---- 避免重复包装 /img_proxy ----
+            if src.startswith("/img_proxy"):
+                continue
+
+            # ---- 补全各种相对路径 ----
+            if src.startswith('//'):  # //img.xx.com/xx.jpg
+                src = 'https:' + src
+
+            elif src.startswith('/'):  # /upload/xxx.jpg
+                src = SITES_CONFIG[site_key]['domain'] + src
+
+            elif src.startswith('./'):  # ./images/xxx.jpg
+                src = SITES_CONFIG[site_key]['domain'] + src[1:]
+
+            elif src.startswith('../'):  # ../xx/xx.jpg
+                src = SITES_CONFIG[site_key]['domain'] + src.replace('../', '', 1)
+
+            # ---- 这里不做更多处理，否则容易误判 HTML 图片 ----
+
+            # ---- URL 转义 + 走 img_proxy ----
+            proxy_url = "/img_proxy?url=" + quote(src, safe='/:?=&')
+
+            tag.attrs = {
+                'src': proxy_url,
+                'loading': 'lazy',
+                'style': 'max-width:100%; height:auto; border-radius:8px; margin:10px 0;'
+            }
+
+        # ============================
+        # 2) 链接处理逻辑
+        # ============================
+        elif tag.name == 'a':
+            href = tag.get('href', '').strip()
+            if not href:
+                continue
+
+            # ---- 避免自引用 /img_proxy ----
+            if href.startswith('/img_proxy'):
+                continue
+
+            # ---- 补全相对路径 ----
+            if href.startswith('//'):
+                href = 'https:' + href
+            elif href.startswith('/'):
+                href = SITES_CONFIG[site_key]['domain'] + href
+
+            # ---- 保留为正常蓝色链接 ----
+            tag.attrs = {
+                'href': href,
+                'target': '_blank',
+                'rel': 'noopener noreferrer',
+                'style': 'color:#007aff; text-decoration:underline; word-break:break-all;'
+            }
+
+    return str(soup)
+
+# ==========================================
+# 3. 出站请求与推送
+# ==========================================
+
+class CircuitOpenError(requests.RequestException):
+    """源站熔断中，请求未发出。"""
+
+class RateLimitedError(requests.RequestException):
+    """限流等待超时，请求未发出；源站本身可能是正常的。"""
+
+class HostGuard:
+    """单个源站的令牌桶限流 + 熔断器 + 健康统计。"""
+    def __init__(self, host):
+        self.host = host
+        self.lock = threading.Lock()
+        self.buckets = {}           # 用途 -> [剩余令牌, 上次补充时间]
+        self.failures = 0           # 连续失败次数
+        self.open_until = 0         # 熔断截止时间 (monotonic)
+        self.probing = False        # 半开状态下是否已有探测请求在途
+        self.stats = {'requests': 0, 'failures': 0, 'retries': 0, 'rejected': 0, 'throttled': 0,
+                      'total_ms': 0, 'last_error': '', 'last_error_at': ''}
+
+    def state(self):
+        if self.failures < BREAKER_FAILURES:
+            return 'closed'
+        return 'open' if time.monotonic() < self.open_until else 'half-open'
+
+    def acquire(self, purpose, max_wait):
+        """熔断检查 + 从该用途的令牌桶取令牌；max_wait 秒内拿不到令牌则放弃。"""
+        rate, burst = FETCH_LIMITS[purpose]
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self.lock:
+                state = self.state()
+                if state == 'open' or (state == 'half-open' and self.probing):
+                    self.stats['rejected'] += 1
+                    raise CircuitOpenError(f"{self.host} 熔断中")
+
+                now = time.monotonic()
+                bucket = self.buckets.setdefault(purpose, [burst, now])
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                if bucket[0] >= 1:
+                    bucket[0] -= 1
+                    if state == 'half-open':
+                        self.probing = True
+                    return
+                wait = (1 - bucket[0]) / rate
+                if now + wait > deadline:
+                    self.stats['throttled'] += 1
+                    raise RateLimitedError(f"{self.host} 请求过多，限流中")
+            time.sleep(wait)
+
+    def end_probe(self):
+        with self.lock:
+            self.probing = False
+
+    def record(self, ok, elapsed, error=''):
+        with self.lock:
+            self.probing = False
+            self.stats['requests'] += 1
+            self.stats['total_ms'] += int(elapsed * 1000)
+            if ok:
+                self.failures = 0
+                return
+            self.failures += 1
+            self.stats['failures'] += 1
+            self.stats['last_error'] = error[:120]
+            self.stats['last_error_at'] = get_beijing_now().strftime('%m-%d %H:%M:%S')
+            if self.failures >= BREAKER_FAILURES:
+                self.open_until = time.monotonic() + BREAKER_COOLDOWN
+
+    def snapshot(self):
+        with self.lock:
+            s = dict(self.stats)
+            s['host'] = self.host
+            s['state'] = self.state()
+            s['avg_ms'] = s['total_ms'] // s['requests'] if s['requests'] else 0
+            return s
+
+class RetryBudget:
+    """全局重试预算：每个请求存入 RETRY_BUDGET_RATIO，每次重试消耗 1，防止源站故障时重试放大流量。"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.balance = RETRY_BUDGET_MAX
+
+    def deposit(self):
+        with self.lock:
+            self.balance = min(RETRY_BUDGET_MAX, self.balance + RETRY_BUDGET_RATIO)
+
+    def withdraw(self):
+        with self.lock:
+            if self.balance >= 1:
+                self.balance -= 1
+                return True
+            return False
+
+# 抓取站点的 guard 常驻；其它 host（/img_proxy 可被任意 URL 访问）放在有上限的 LRU 里
+site_guards = {urlparse(cfg['domain']).netloc.lower(): HostGuard(urlparse(cfg['domain']).netloc.lower())
+               for cfg in SITES_CONFIG.values()}
+host_guards = OrderedDict()
+host_guards_lock = threading.Lock()
+retry_budget = RetryBudget()
+
+def get_host_guard(url):
+    host = urlparse(url).netloc.lower()
+    if host in site_guards:
+        return site_guards[host]
+    with host_guards_lock:
+        guard = host_guards.get(host)
+        if guard is not None:
+            host_guards.move_to_end(host)
+            return guard
+        if len(host_guards) >= HOST_GUARDS_MAX:
+            # 优先淘汰最久未用且处于正常状态的 guard，保留熔断中的以免源站故障时被绕过
+            victim = next((h for h, g in host_guards.items() if g.state() == 'closed' and not g.probing),
+                          next(iter(host_guards)))
+            del host_guards[victim]
+        guard = host_guards[host] = HostGuard(host)
+        return guard
+
+def host_health():
+    """抓取站点固定在前，其余按异常优先、请求数倒序，最多 HOST_HEALTH_ROWS 行。"""
+    with host_guards_lock:
+        others = list(host_guards.values())
+    snapshots = [g.snapshot() for g in site_guards.values()]
+    snapshots += sorted((g.snapshot() for g in others), key=lambda s: (s['state'] == 'closed', -s['requests']))
+    return snapshots[:HOST_HEALTH_ROWS]
+
+def fetch(url, purpose='crawl', retries=1, max_wait=2, **kwargs):
+    """
+    所有出站 GET 的统一入口：按 host 熔断、按 host + 用途限流，连接错误/超时/5xx/429 带抖动重试（受全局预算约束）。
+    熔断时抛出 CircuitOpenError，限流时抛出 RateLimitedError，调用方按原有异常分支返回缓存或占位内容。
+    用户请求路径应传 retries=0，避免读超时重试把线程占用时间翻倍。
+    """
+    guard = get_host_guard(url)
+    kwargs.setdefault('timeout', FETCH_TIMEOUT)
+    retry_budget.deposit()
+
+    attempt = 0
+    while True:
+        guard.acquire(purpose, max_wait)
+        start = time.monotonic()
+        try:
+            r = session_req.get(url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            guard.record(False, time.monotonic() - start, str(e))
+            if attempt >= retries or not retry_budget.withdraw():
+                raise
+        except requests.RequestException as e:
+            guard.record(False, time.monotonic() - start, str(e))
+            raise
+        else:
+            if r.status_code < 500 and r.status_code != 429:
+                guard.record(True, time.monotonic() - start)
+                return r
+            guard.record(False, time.monotonic() - start, f"HTTP {r.status_code}")
+            if attempt >= retries or not retry_budget.withdraw():
+                return r
+            r.close()
+        finally:
+            # 任何异常（包括非 requests 异常）都要结束半开探测，否则该 host 会一直被拒绝
+            guard.end_probe()
+
+        attempt += 1
+        with guard.lock:
+            guard.stats['retries'] += 1
+        time.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** attempt))
+
+class ArticleHub:
+    """
+    进程内的新文章通知：publish 记下最新的 articles.id 并唤醒 /stream 的等待连接。
+    文章内容由各连接自己从数据库读取，这里只负责让本进程的写入更快送达。
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.last_id = 0
+
+    def publish(self, article_id):
+        with self.cond:
+            self.last_id = max(self.last_id, article_id)
+            self.cond.notify_all()
+
+    def latest_id(self):
+        with self.cond:
+            return self.last_id
+
+    def wait(self, seen_id, timeout):
+        """还没有比 seen_id 更新的通知时，最多阻塞 timeout 秒。"""
+        with self.cond:
+            if self.last_id <= seen_id:
+                self.cond.wait(timeout)
+
+article_hub = ArticleHub()
+
+def article_summary(row):
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'tag': row['match_keyword'],
+        'site': row['site_source'],
+        'time': row['original_time'],
+        'is_top': row['is_top'],
+        'url': f"/view?id={row['id']}"
+    }
+
+def publish_article(article_id):
+    article_hub.publish(article_id)
+
+# ==========================================
+# 4. 抓取
+# ==========================================
+
+def scrape_all_sites():
+    global LAST_ACTIVE_TIME
+    if scrape_lock.locked():
+        print("抓取锁被占用，跳过本次执行")
+        return
+    
+    with scrape_lock:
+        try:
+            now_beijing = get_beijing_now()
+            
+            # 无人访问休眠逻辑
+            if (now_beijing - LAST_ACTIVE_TIME).total_seconds() > 3600:
+                if now_beijing.minute % 60 == 0:
+                    print(f"[{now_beijing.strftime('%H:%M')}] 系统处于无人访问休眠状态...")
+                return
+
+            # 夜间低频模式
+            if 1 <= now_beijing.hour <= 5:
+                if now_beijing.minute % 30 != 0:
+                    return
+
+            conn = get_db_connection()
+            rules = conn.execute("SELECT * FROM config_rules").fetchall()
+            title_white = [r['keyword'] for r in rules if r['rule_type']=='white' and r['match_scope']=='title']
+            title_black = [r['keyword'] for r in rules if r['rule_type']=='black' and r['match_scope']=='title']
+            url_black   = [r['keyword'] for r in rules if r['rule_type']=='black' and r['match_scope']=='url']
+            
+            base_keywords = ALL_BANK_VALS + title_white
+            stats = {}
+            new_ids = []
+            
+            # 用于本次抓取去重的集合（标题标准化后）
+            seen_titles_this_run = set()
+
+            for skey, cfg in SITES_CONFIG.items():
+                count = 0
+                try:
+                    print(f"\n=== 开始抓取 {cfg['name']} ({skey}) ===")
+                    r = fetch(cfg['list_url'], retries=2, max_wait=10)
+                    print(f"  状态码: {r.status_code}")
+                    
+                    soup = BeautifulSoup(r.text, "html.parser")
+                    items = soup.select(cfg['list_selector'])
+                    print(f"  找到 {len(items)} 个匹配项")
+                    
+                    for idx, item in enumerate(items, 1):
+                        # --- 修改后的 a 标签提取逻辑 ---
+                        if item.name == 'a':
+                            # 如果 item 本身就是 <a> 标签（常见于鲸线报等站点），直接使用它
+                            # print(f"  [{skey} {idx:02d}] Item 本身就是 <a> 标签，使用它。")
+                            a = item
+                        else:
+                            # 否则，在 item 内部查找合适的 <a>（兼容其他站点）
+                            # print(f"  [{skey} {idx:02d}] Item 不是 <a>，在内部查找 <a>。")
+                            a = item.select_one("a[href*='view'], a[href*='thread'], a[href*='post'], a[href*='/detail'], a[href*='/xianbao/detail']") or item.find("a")
+                        
+                        if not a:
+                            # print(f"  [{skey} {idx:02d}] ERROR: 未能找到 <a> 标签，跳过")
+                            continue
+                        
+                        # 标题和 URL 必须从 a 取
+                        t = a.get_text(strip=True).strip()
+                        if not t or len(t) < 5:
+                            # print(f"  [{skey} {idx:02d}] 标题太短或为空，跳过")
+                            continue
+                        
+                        h = a.get("href", "")
+                        url = h if h.startswith("http") else (cfg['domain'] + (h if h.startswith("/") else "/" + h))
+                        lower_t = t.lower()
+                        lower_url = url.lower()
+                        
+                        # --- 标题规范化 + 本次运行去重 ---
+                        normalized_title = re.sub(r'\s+', ' ', t.strip().lower())
+                        normalized_title = re.sub(r'[，。！？、；：“”‘’（）【】]', '', normalized_title)
+                        
+                        if normalized_title in seen_titles_this_run:
+                            # print(f"  [{skey} {idx:02d}] 标题已在本次运行中出现过，跳过: {t[:50]}...")
+                            continue
+                        
+                        seen_titles_this_run.add(normalized_title)
+                        # -----------------------------------------------
+                        
+                        # jd/tb 过滤
+                        if 'jd.com' in lower_url or 'tb.cn' in lower_url or 'jd.com' in lower_t or 'tb.cn' in lower_t:
+                            # print(f"  [{skey} {idx:02d}] jd/tb 过滤跳过")
+                            continue
+                        
+                        # 黑名单过滤
+                        black_hit = any(b in url for b in url_black) or any(b in t for b in title_black)
+                        if black_hit:
+                            # print(f"  [{skey} {idx:02d}] 被黑名单过滤跳过")
+                            continue
+                        
+                        # 关键词匹配
+                        kw = next((k for k in base_keywords if k.lower() in lower_t), None)
+                        if kw:
+                            # print(f"  [{skey} {idx:02d}] 匹配关键词: {kw}")
+                            tag = kw
+                            for b_name, b_v in BANK_KEYWORDS.items():
+                                if kw in b_v:
+                                    tag = b_name
+                                    break
+                            
+                            # print(f"      → 尝试插入 (tag={tag}) URL: {url}")
+                            cur = conn.execute('INSERT OR IGNORE INTO articles (title, url, site_source, match_keyword, original_time) VALUES(?,?,?,?,?)',
+                                               (t, url, skey, tag, now_beijing.strftime("%H:%M")))
+                            changes = cur.rowcount
+                            # print(f"      → 插入结果 changes={changes}")
+                            
+                            if changes > 0:
+                                count += 1
+                                new_ids.append(cur.lastrowid)
+                                # print("      → 成功插入！count +1")
+                            # else:
+                            #     print("      → 未插入（可能是重复URL）")
+                        # else:
+                        #     print(f"  [{skey} {idx:02d}] 无关键词匹配，跳过")
+                        
+                        # print("─" * 80)  # 分隔线，便于阅读
+                    
+                    stats[cfg['name']] = count
+                
+                except Exception as e:
+                    print(f"抓取 {skey} 失败: {e}")
+                    stats[cfg['name']] = "Error"
+                
+                print(f"  {cfg['name']} 本次新增: {count} 条\n")
+            
+            # --- 清理旧数据 ---
+            conn.execute("DELETE FROM articles WHERE site_source != 'user' AND updated_at < datetime('now', '-4 days')")
+            
+            # --- 记录日志 ---
+            conn.execute('INSERT INTO scrape_log(last_scrape) VALUES(?)', 
+                         (f"[{now_beijing.strftime('%m-%d %H:%M')}] {stats}",))
+            
+            conn.commit()
+            
+            # --- 推送新文章给 /stream 订阅者 ---
+            for aid in new_ids:
+                publish_article(aid)
+            conn.close()
+            
+        except Exception as e:
+            print(f"Scrape Loop Error: {e}")
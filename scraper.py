@@ -1,16 +1,23 @@
 # scraper.py
+import time
+_start = time.perf_counter()
+
 import traceback
-from app import scrape_all_sites, get_db_connection
+# 只导入抓取核心，不加载 Flask / waitress / 整个 Web 应用
+from core import scrape_all_sites, get_db_connection
+
+IMPORT_SECONDS = time.perf_counter() - _start
 
 if __name__ == "__main__":
-    print("Scraper started...")
+    print(f"Scraper started... (import {IMPORT_SECONDS * 1000:.0f} ms)")
     try:
         # 初始化数据库
         get_db_connection().close()
+        print(f"Startup finished in {(time.perf_counter() - _start) * 1000:.0f} ms")
         
         # 强制抓取（忽略无人访问休眠）
         scrape_all_sites()
-        print("Scraper finished successfully!")
+        print(f"Scraper finished successfully! (total {time.perf_counter() - _start:.1f} s)")
     except Exception as e:
         print("Scraper error:")
         traceback.print_exc()